@@ -1,12 +1,44 @@
 import csv
 import os
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from tabulate import tabulate
+import bisect
 import heapq
+import itertools
+import locale
+import math
+import mmap
+import operator
+import queue
+import re
+import shutil
+import tempfile
+import threading
+
+# Tables at least this large are aggregated in parallel worker processes
+PARALLEL_SCAN_BYTES = 8 << 20
+
+# A quoted CSV value, which starts with a quote at the beginning of a field and runs to the next quote
+# that is not doubled, or to the end of the file, as csv.reader reads it
+QUOTED_VALUE = re.compile(rb'"(?<![^,\r\n]")[^"]*(?:""[^"]*)*(?:"|\Z)')
+
+# Reduction used by each aggregate operation, both within a chunk and to combine partial results.
+# Averages are computed as sums and divided by the row count at the end.
+AGGREGATE_REDUCERS = {'average': sum, 'sum': sum, 'minimum': min, 'maximum': max}
+
+# Starting value of each aggregate operation, which leaves the first reduced value unchanged
+AGGREGATE_IDENTITIES = {'average': 0, 'sum': 0, 'minimum': math.inf, 'maximum': -math.inf}
 
 class NaiveDB:
     def __init__(self):
-        pass
+        # IDs seen in each table, built on first use so that inserts don't rescan the CSV file, together
+        # with the signature of the file they were read from
+        self._id_cache = {}
+        # Tables whose IDs have already been searched for once without building their ID set
+        self._id_probed = set()
+        # Results of earlier aggregate queries, together with the signature of the file they were read from
+        self._aggregate_cache = {}
         
     def create_table(self, table_name, columns):
         """
@@ -51,9 +83,15 @@ class NaiveDB:
             print(f"ID '{target_id}' already exists in the CSV file. Insertion prevented.")
             return
 
+        signature = self.file_signature(csv_file)
         with open(csv_file, 'a', newline='') as file:
             writer = csv.writer(file)
             writer.writerow(values)
+        # Keep an up to date ID set valid for the file as it is after this append
+        cached = self._id_cache.get(table_name)
+        if cached is not None and cached[0] == signature:
+            cached[1].add(target_id)
+            self._id_cache[table_name] = (self.file_signature(csv_file), cached[1])
 
         print(f"Record inserted into table '{table_name}'.")
     
@@ -71,35 +109,146 @@ class NaiveDB:
         """
         csv_file = f"{table_name}.csv"
         if not os.path.exists(csv_file):
-            return False  
+            return False
+        # A table without an ID column cannot hold duplicate IDs
+        if id_column not in self.read_header(csv_file):
+            return False
+
+        cached = self._id_cache.get(table_name)
+        if cached is not None and cached[0] == self.file_signature(csv_file):
+            return target_id in cached[1]
+
+        # A single lookup is answered by searching the raw file; the ID set is only built once the
+        # table is looked up again
+        if table_name not in self._id_probed:
+            found = self.find_leading_id(csv_file, id_column, target_id)
+            if found is not None:
+                self._id_probed.add(table_name)
+                return found
+
+        return target_id in self.load_ids(table_name, id_column)
+
+    def find_leading_id(self, csv_file, id_column, target_id):
+        """
+        Search the raw bytes of a table for a row starting with the given ID, without parsing any
+        row. This only works when the ID column is the first column and the file contains no quotes at
+        all, since a quoted value can hold a line break followed by anything and an ID can itself be
+        written in quotes.
 
-        with open(csv_file, 'r') as file:
-            csv_reader = csv.DictReader(file)
-            for row in csv_reader:
-                if id_column in row and row[id_column] == target_id:
-                    return True  
-        return False  
+        Parameters:
+        - csv_file (str): The path to the CSV file.
+        - id_column (str): The name of the ID column.
+        - target_id (str): The ID to search for.
 
-    def read_csv_in_chunks(self, csv_file, chunk_size=500):
+        Returns:
+        - bool or None: True if a row starts with the ID, False if none does, or None if the file
+          cannot be searched this way.
         """
-        The function reads a CSV file in chunks and yields each chunk as a list of dictionaries
-        representing rows in the file.
-        
+        header = self.read_header(csv_file)
+        if header[:1] != [id_column] or any(c in target_id for c in ',"\r\n'):
+            return None
+
+        # The ID ends at the next value, at the end of its line, or at the end of the file when the row
+        # holds only the ID
+        encoded_id = target_id.encode(locale.getpreferredencoding(False))
+        leading_id = re.compile(b'\n' + re.escape(encoded_id) + rb'(?:,|\r|\n|\Z)')
+        with open(csv_file, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm.find(b'"') != -1:
+                return None
+            return leading_id.search(mm) is not None
+
+    def load_ids(self, table_name, id_column):
+        """
+        Return the set of IDs stored in the specified table, reading the table only when the set has
+        not been built yet or the file has changed since. Later calls are served from memory; `insert`
+        adds to the set and `delete` and `updateTable` discard it so that it is rebuilt on the next
+        lookup.
+
+        Parameters:
+        - table_name (str): The name of the table.
+        - id_column (str): The name of the ID column.
+
+        Returns:
+        - set: The IDs found in the table. A table without the ID column gets an empty set, which is
+          not kept.
+        """
+        csv_file = f"{table_name}.csv"
+        signature = self.file_signature(csv_file)
+        cached = self._id_cache.get(table_name)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        header = self.read_header(csv_file)
+        if id_column not in header:
+            return set()
+        id_index = header.index(id_column)
+
+        ids = set()
+        for chunk in self.read_csv_in_chunks(csv_file):
+            ids.update(row[id_index] for row in chunk)
+        self._id_cache[table_name] = (signature, ids)
+        return ids
+
+    def file_signature(self, csv_file):
+        """
+        The function returns a value that changes whenever a file is modified or replaced, to tell
+        whether results computed from the file are still valid.
+
+        :param csv_file: The path to the file
+        :return: a tuple of the file's inode number, modification time in nanoseconds and size.
+        """
+        stat = os.stat(csv_file)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def read_header(csv_file):
+        """
+        The function reads the header row of a CSV file.
+
+        :param csv_file: The path to the CSV file whose header you want to read
+        :return: a list of column names, or an empty list if the file has no header row.
+        """
+        with open(csv_file, 'r', newline='') as file:
+            return next(csv.reader(file), [])
+
+    @staticmethod
+    def read_csv_in_chunks(csv_file, chunk_size=500, byte_range=None):
+        """
+        The function reads a CSV file in chunks and yields each chunk as a list of rows. Rows are
+        positional lists of values in header order (use `read_header` to map column names to
+        positions), which avoids building a dictionary for every row.
+
         :param csv_file: The path to the CSV file that you want to read in chunks
         :param chunk_size: The `chunk_size` parameter determines the number of rows to read in each
         chunk. In this case, the default value is set to 500, meaning that the CSV file will be read in
         chunks of 500 rows at a time, defaults to 500 (optional)
+        :param byte_range: The `byte_range` parameter is a `(start, end)` pair of byte offsets, as
+        returned by `split_csv_ranges`. When it is given, only the rows inside that part of the file are
+        read, defaults to None (optional)
         :return: a generator object that yields chunks of rows from the CSV file. Each chunk is a list
-        of dictionaries representing rows in the CSV file.
+        of lists representing rows in the CSV file, without the header row or blank lines. Rows shorter
+        than the header are padded with empty strings.
         """
-       
+
         if not os.path.exists(csv_file):
             print(f"Table '{csv_file}' does not exist.")
             return
-        with open(csv_file, 'r') as file:
-            csv_reader = csv.DictReader(file)
+        if byte_range is None:
+            file = open(csv_file, 'r', newline='')
+            csv_reader = csv.reader(file)
+            width = len(next(csv_reader, []))
+        else:
+            width = len(NaiveDB.read_header(csv_file))
+            file = open(csv_file, 'rb')
+            csv_reader = csv.reader(NaiveDB.read_lines_in_range(file, *byte_range))
+        with file:
             rows = []
             for row in csv_reader:
+                # Skip blank lines and fill in the missing values of short rows, as csv.DictReader does
+                if not row:
+                    continue
+                if len(row) < width:
+                    row += [''] * (width - len(row))
                 rows.append(row)
                 if len(rows) == chunk_size:
                     yield rows
@@ -107,6 +256,70 @@ class NaiveDB:
             if rows:
                 yield rows
 
+    @staticmethod
+    def read_lines_in_range(file, start, end):
+        """
+        The function yields the decoded lines of a binary file that start between two byte offsets.
+
+        :param file: A file object opened in binary mode
+        :param start: The byte offset of the first line, which must be the start of a line
+        :param end: The byte offset at which to stop reading
+        :return: a generator object that yields the lines as strings.
+        """
+        # Decode with the encoding that `open` uses in text mode, as when the whole file is read
+        encoding = locale.getpreferredencoding(False)
+        file.seek(start)
+        position = start
+        for line in file:
+            if position >= end:
+                break
+            position += len(line)
+            yield line.decode(encoding)
+
+    def split_csv_ranges(self, csv_file, parts):
+        """
+        The function splits the rows of a CSV file into byte ranges of roughly equal size that begin
+        and end on line boundaries, so that each range can be read on its own. The file is
+        memory-mapped and only searched for quoted values and for the line break closest to each split
+        point, so no row is parsed. Line breaks inside quoted values are skipped, since they do not end
+        a row.
+
+        :param csv_file: The path to the CSV file that you want to split
+        :param parts: The number of ranges to split the rows into
+        :return: a list of `(start, end)` byte offsets covering every row after the header. The list
+        has fewer than `parts` entries when the file is too small to split further.
+        """
+        size = os.path.getsize(csv_file)
+        if size == 0:
+            return []
+        with open(csv_file, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            multiline_values = [match.span() for match in QUOTED_VALUE.finditer(mm) if b'\n' in match.group()]
+            value_starts = [value_start for value_start, _ in multiline_values]
+
+            def next_row_start(position):
+                # Find the first line break from the position on that is not inside a quoted value
+                while True:
+                    newline = mm.find(b'\n', position)
+                    if newline == -1:
+                        return -1
+                    value = bisect.bisect_right(value_starts, newline) - 1
+                    if value < 0 or newline >= multiline_values[value][1]:
+                        return newline + 1
+                    position = multiline_values[value][1]
+
+            start = next_row_start(0)
+            if start == -1 or start == size:
+                return []
+
+            boundaries = [start]
+            for part in range(1, parts):
+                row_start = next_row_start(max(start + (size - start) * part // parts, boundaries[-1]))
+                if row_start == -1 or row_start >= size:
+                    break
+                boundaries.append(row_start)
+            boundaries.append(size)
+        return list(zip(boundaries, boundaries[1:]))
+
     def select(self, table_name, columns=None,chunk_size=500):
         """
         The `select` function selects and prints rows from a CSV table with optional column filtering.
@@ -127,41 +340,50 @@ class NaiveDB:
             print(f"Table '{table_name}' does not exist.")
             return
 
-        with open(csv_file, 'r') as file:
-            csv_reader = csv.DictReader(file)
+        header = self.read_header(csv_file)
 
-            if columns:
-                if not set(columns).issubset(csv_reader.fieldnames):
-                    print("One or more specified columns do not exist in the table.")
-                    return
-                if columns:
-                    print("\t".join(columns))
+        if columns:
+            if not set(columns).issubset(header):
+                print("One or more specified columns do not exist in the table.")
+                return
+            print("\t".join(columns))
 
-                rows = []
-                for i, row in enumerate(csv_reader):
-                    if not set(columns).issubset(row.keys()):
-                        continue
-                    values = [row[col] for col in columns]
-                    rows.append("\t".join(values))
+            # Resolve the column positions once and project every row with a single itemgetter call
+            get_columns = operator.itemgetter(*[header.index(col) for col in columns])
+            if len(columns) == 1:
+                project = lambda row: (get_columns(row),)
+            else:
+                project = get_columns
+        else:
+            project = None
 
-                    if (i + 1) % chunk_size == 0:
-                        print("\n".join(rows))
-                        rows = []
+        for chunk in self.read_csv_in_chunks(csv_file, chunk_size):
+            rows = chunk if project is None else map(project, chunk)
+            print("\n".join(map("\t".join, rows)))
 
-                if rows:
-                    print("\n".join(rows))
-            else:
-                
-                rows = []
-                for i, row in enumerate(csv_reader):
-                    rows.append("\t".join(row.values()))
+    def print_rows(self, header, rows):
+        """
+        The function prints rows as dictionaries keyed by the column names. The output for all the rows
+        is built as one string and printed with a single call, instead of one `print` per row.
 
-                    if (i + 1) % chunk_size == 0:
-                        print("\n".join(rows))
-                        rows = []
+        :param header: The list of column names, in the same order as the values of each row
+        :param rows: The rows to print, as positional lists of values
+        """
+        lines = [str(dict(zip(header, row))) for row in rows]
+        if lines:
+            print("\n".join(lines))
 
-                if rows:
-                    print("\n".join(rows))
+    def print_table(self, csv_file, chunk_size=500):
+        """
+        The function prints every row of a CSV file as a dictionary keyed by its header, one chunk at a
+        time.
+
+        :param csv_file: The path to the CSV file that you want to print
+        :param chunk_size: The number of rows printed with each call, defaults to 500 (optional)
+        """
+        header = self.read_header(csv_file)
+        for chunk in self.read_csv_in_chunks(csv_file, chunk_size):
+            self.print_rows(header, chunk)
 
     # To perform querying on the ordered file select table name as ordered
     def order_by(self, table_name, order_column, output_file="ordered.csv", chunk_size=500):
@@ -189,85 +411,143 @@ class NaiveDB:
         temp_folder = "sorted_chunks"  
         os.makedirs(temp_folder, exist_ok=True)
 
-        def int_or_original(x):
-            try:
-                return int(x)
-            except (ValueError, TypeError):
-                return str(x)
-
         try:
             # Phase 1: Divide and sort chunks
-            chunk_count = 0
-            fieldnames = None  
-            temp_files = [] 
-
-            with open(csv_file, 'r') as file:
-                csv_reader = csv.DictReader(file)
-                chunk = []
-                for row in csv_reader:
-                    if fieldnames is None:
-                        fieldnames = csv_reader.fieldnames
-                    chunk.append(row)
-
-                    if len(chunk) >= chunk_size:
-                        chunk.sort(key=lambda x: int_or_original(x.get(order_column)))
-                        temp_file_name = os.path.join(temp_folder, f"sorted_chunk_{chunk_count}.csv")
-                        with open(temp_file_name, 'w', newline='') as temp_file:
-                            writer = csv.DictWriter(temp_file, fieldnames=fieldnames)
-                            writer.writeheader()
-                            writer.writerows(chunk)
-                        temp_files.append(temp_file_name)
-                        chunk_count += 1
-                        chunk = []
-
-                if chunk:
-                    chunk.sort(key=lambda x: int_or_original(x.get(order_column)))
+            header = self.read_header(csv_file)
+            if order_column not in header:
+                print(f"Column '{order_column}' does not exist in the table.")
+                return
+            order_index = header.index(order_column)
+            temp_files = []
+
+            # Sorted runs are written by a separate thread so that sorting the next chunk overlaps
+            # with writing the previous one to disk
+            run_queue = queue.Queue(maxsize=2)
+            writer_errors = []
+
+            def write_runs():
+                while True:
+                    item = run_queue.get()
+                    if item is None:
+                        return
+                    if writer_errors:
+                        continue
+                    temp_file_name, rows = item
+                    try:
+                        with open(temp_file_name, 'w', newline='', buffering=1 << 20) as temp_file:
+                            writer = csv.writer(temp_file)
+                            writer.writerow(header)
+                            writer.writerows(rows)
+                    except Exception as e:
+                        # Keep draining the queue so that the sorting loop never blocks on a full queue
+                        writer_errors.append(e)
+
+            writer_thread = threading.Thread(target=write_runs)
+            writer_thread.start()
+
+            try:
+                for chunk_count, chunk in enumerate(self.read_csv_in_chunks(csv_file, chunk_size)):
+                    if writer_errors:
+                        break
+                    keys = self.sort_keys([row[order_index] for row in chunk])
+                    order = sorted(range(len(chunk)), key=keys.__getitem__)
+
                     temp_file_name = os.path.join(temp_folder, f"sorted_chunk_{chunk_count}.csv")
-                    with open(temp_file_name, 'w', newline='') as temp_file:
-                        writer = csv.DictWriter(temp_file, fieldnames=fieldnames)
-                        writer.writeheader()
-                        writer.writerows(chunk)
+                    run_queue.put((temp_file_name, [chunk[i] for i in order]))
                     temp_files.append(temp_file_name)
+            finally:
+                run_queue.put(None)
+                writer_thread.join()
+            if writer_errors:
+                raise writer_errors[0]
 
-            # Phase 2: Merge sorted chunks using external merge sort
-            temp_file_iters = [csv.DictReader(open(temp_file, 'r')) for temp_file in temp_files]
+            # Phase 2: Merge sorted chunks using external merge sort. The runs share one chunk worth of
+            # read buffer, and each row is paired with its precomputed key so that the merge compares
+            # keys directly instead of converting them on every comparison
+            merge_chunk_size = max(1, chunk_size // max(1, len(temp_files)))
 
-            # Merge sorted chunks into a list
-            # merged_rows = list(heapq.merge(*temp_file_iters, key=lambda x: int_or_original(x[order_column])))
+            def keyed_rows(temp_file):
+                for chunk in self.read_csv_in_chunks(temp_file, merge_chunk_size):
+                    yield from zip(self.sort_keys([row[order_index] for row in chunk]), chunk)
 
             # Clear the output file if it exists and write the ordered data
             if os.path.exists(output_file):
                 os.remove(output_file)
             with open(output_file, 'w', newline='') as output_csv:
-                output_writer = csv.DictWriter(output_csv, fieldnames=fieldnames)
-                output_writer.writeheader()
+                output_writer = csv.writer(output_csv)
+                output_writer.writerow(header)
 
                 # Merge and write rows directly to the output file using on the fly execution
-                for row in heapq.merge(*temp_file_iters, key=lambda x: int_or_original(x[order_column])):
-                    output_writer.writerow(row)
+                merged = heapq.merge(*map(keyed_rows, temp_files), key=operator.itemgetter(0))
+                output_writer.writerows(map(operator.itemgetter(1), merged))
 
-            
-            with open(output_file, 'r') as output_csv:
-                output_reader = csv.DictReader(output_csv)
-                for row in output_reader:
-                    print(row)
+            self.print_table(output_file, chunk_size)
 
             print(f"Data ordered by '{order_column}' and saved to {output_file}.")
 
         except Exception as e:
             print(f"An error occurred: {str(e)}")       
 
-    def delete(self, table_name, condition):
+    def sort_keys(self, values):
         """
-        The `delete` function deletes rows from a CSV table based on a specified condition by creating a
-        new CSV file without the rows that match the condition and then replacing the original dataset
-        with the new data.
+        Convert column values to sort keys: integers where possible, strings otherwise. The whole
+        list is converted at once, and values are only converted one by one when the list holds
+        something that is not an integer.
+
+        Parameters:
+        - values (list): The column values.
+
+        Returns:
+        - list: The sort key of each value.
+        """
+        try:
+            return list(map(int, values))
+        except ValueError:
+            return [self.int_or_original(value) for value in values]
+
+    def int_or_original(self, value):
+        """
+        Convert a value to int, keeping it as a string when that is not possible.
+
+        Parameters:
+        - value: The value to convert.
+
+        Returns:
+        - int or str: The converted value.
+        """
+        try:
+            return int(value)
+        except (ValueError, TypeError):
+            return str(value)
+
+    def create_temp_table(self, csv_file):
+        """
+        Create a temporary CSV file in the same directory as a table, so that the table can later be
+        replaced by it with a single atomic `os.replace`. The file gets the table's permissions.
+
+        Parameters:
+        - csv_file (str): The path to the table's CSV file.
+
+        Returns:
+        - file object: The open temporary file. It is not deleted when closed.
+        """
+        temp_file = tempfile.NamedTemporaryFile('w', newline='', buffering=1 << 20, suffix='.csv',
+                                                dir=os.path.dirname(csv_file) or '.', delete=False)
+        shutil.copymode(csv_file, temp_file.name)
+        return temp_file
+
+    def delete(self, table_name, condition_col, condition_val):
+        """
+        The `delete` function deletes the rows of a CSV table whose value in a given column equals a given
+        value by streaming the other rows into a temporary file and then atomically replacing the
+        original dataset with it.
         
         :param table_name: The `table_name` parameter is a string that represents the name of the CSV
         table from which rows will be deleted
-        :param condition: The `condition` parameter is a function that takes a row as input and returns
-        a boolean value indicating whether to delete the row. This function is used to determine which
-        rows should be deleted from the CSV table
+        :param condition_col: The `condition_col` parameter is the name of the column whose values are
+        compared with `condition_val`
+        :param condition_val: The `condition_val` parameter is the value to look for in the
+        `condition_col` column. Rows holding exactly this value are deleted from the CSV table
         :return: The `delete` method does not return anything.
         """
         csv_file = f"{table_name}.csv"
@@ -275,31 +555,30 @@ class NaiveDB:
             print(f"Table '{table_name}' does not exist.")
             return
 
-        new_csv_file = "output.csv"  
+        header = self.read_header(csv_file)
+        if condition_col not in header:
+            print(f"Column '{condition_col}' does not exist in the table.")
+            return
+        get_condition = operator.itemgetter(header.index(condition_col))
 
-        for chunk in self.read_csv_in_chunks(csv_file, chunk_size=500):
-            with open(new_csv_file, 'a', newline='') as file:
-                columns = chunk[0].keys() if chunk else []  
-                writer = csv.DictWriter(file, fieldnames=columns)
-                if file.tell() == 0:  
-                    writer.writeheader()
+        # Stream the rows to keep into a temporary file next to the table
+        new_csv_file = self.create_temp_table(csv_file)
+        try:
+            with new_csv_file as file:
+                writer = csv.writer(file)
+                writer.writerow(header)
+
+                for chunk in self.read_csv_in_chunks(csv_file, chunk_size=500):
+                    # Check the condition column of the whole chunk and keep the rows that don't match
+                    keep = [value != condition_val for value in map(get_condition, chunk)]
+                    writer.writerows(itertools.compress(chunk, keep))
+        except BaseException:
+            os.remove(new_csv_file.name)
+            raise
 
-                for row in chunk:
-                    if not condition(row):
-                        writer.writerow(row)  
-        with open(csv_file, 'w', newline='') as file:
-            file.truncate(0)
-        
-        
-        for chunk in self.read_csv_in_chunks(new_csv_file, chunk_size=500):
-            with open(csv_file, 'a', newline='') as file:
-                columns = chunk[0].keys() if chunk else []  
-                writer = csv.DictWriter(file, fieldnames=columns)
-                if file.tell() == 0:  
-                    writer.writeheader()
-                writer.writerows(chunk)        
         # Replace the original dataset with the new data
-        os.remove(new_csv_file)
+        os.replace(new_csv_file.name, csv_file)
+        self._id_cache.pop(table_name, None)
 
     def group_by(self, table_name, group_column, output_file="grouped.csv", chunk_size=500):
         """
@@ -324,59 +603,30 @@ class NaiveDB:
             print(f"Table '{table_name}' does not exist.")
             return
 
-        temp_folder = "grouped_chunks"
-        os.makedirs(temp_folder, exist_ok=True)  
-
-        grouped_chunks = defaultdict(list)
+        grouped_rows = defaultdict(list)
 
         try:
-            with open(csv_file, 'r') as file:
-                csv_reader = csv.DictReader(file)
-                current_chunk = []
+            header = self.read_header(csv_file)
+            if group_column not in header:
+                print(f"Column '{group_column}' does not exist in the table.")
+                return
+            group_index = header.index(group_column)
 
-                for row in csv_reader:
+            for chunk in self.read_csv_in_chunks(csv_file, chunk_size):
+                for row in chunk:
                     # Normalize the group column value to ensure consistent grouping
-                    group_value = row[group_column].strip()
-                    row[group_column] = group_value
-                    current_chunk.append(row)
+                    group_value = row[group_index].strip()
+                    row[group_index] = group_value
+                    grouped_rows[group_value].append(row)
 
-                    if len(current_chunk) >= chunk_size:
-                        for row in current_chunk:
-                            key = row[group_column]
-                            grouped_chunks[key].append(row)
-                        current_chunk = []
+            # Write the groups one after another in a single sequential pass
+            with open(output_file, 'w', newline='', buffering=1 << 20) as output_csv:
+                output_writer = csv.writer(output_csv)
+                output_writer.writerow(header)
 
-                for row in current_chunk:
-                    key = row[group_column]
-                    grouped_chunks[key].append(row)
-
-            sorted_files = []
-
-            for group_key, group_rows in grouped_chunks.items():
-                # Sort the chunk by the group key
-                group_rows.sort(key=lambda x: x[group_column])
-
-                temp_file_name = os.path.join(temp_folder, f"temp_{group_key}.csv")
-                with open(temp_file_name, 'w', newline='') as temp_file:
-                    writer = csv.DictWriter(temp_file, fieldnames=group_rows[0].keys())
-                    writer.writeheader()
-                    writer.writerows(group_rows)
-
-                sorted_files.append(temp_file_name)
-
-            with open(output_file, 'w', newline='') as output_csv:
-                output_writer = csv.DictWriter(output_csv, fieldnames=grouped_chunks[next(iter(grouped_chunks))][0].keys())
-                output_writer.writeheader()
-
-                for temp_file_name in sorted_files:
-                    with open(temp_file_name, 'r') as temp_file:
-                        csv_reader = csv.DictReader(temp_file)
-                        for row in csv_reader:
-                            output_writer.writerow(row)
-            with open(output_file, 'r') as output_csv:
-                output_reader = csv.DictReader(output_csv)
-                for row in output_reader:
-                    print(row)
+                for group_rows in grouped_rows.values():
+                    output_writer.writerows(group_rows)
+            self.print_table(output_file, chunk_size)
 
             print(f"Grouped data saved to {output_file}.")
 
@@ -402,35 +652,33 @@ class NaiveDB:
         if not os.path.exists(csv_file):
             print(f"Table '{table_name}' does not exist.")
             return
-        new_csv_file = "filtered.csv" 
-        # filter_condition = lambda row: row.get(column_name) == condition_value
-        if condition_type == "equalTo":
-            filter_condition = lambda row: row.get(column_name) == condition_value
-        elif condition_type == "smallerThan":
-            filter_condition = lambda row: self.compare_values(row.get(column_name), condition_value, reverse=False)
-        elif condition_type == "biggerThan":
-            filter_condition = lambda row: self.compare_values(row.get(column_name), condition_value, reverse=True)
-        else:
+        new_csv_file = "filtered.csv"
+        header = self.read_header(csv_file)
+        if column_name not in header:
+            print(f"Column '{column_name}' does not exist in the table.")
+            return
+        column_index = header.index(column_name)
+
+        # Each condition maps the column values of a whole chunk to one boolean per row
+        filter_conditions = {
+            "equalTo": lambda values: [value == condition_value for value in values],
+            "smallerThan": lambda values: self.compare_column(values, condition_value, reverse=False),
+            "biggerThan": lambda values: self.compare_column(values, condition_value, reverse=True),
+        }
+        filter_condition = filter_conditions.get(condition_type)
+        if filter_condition is None:
             print(f"Invalid condition type: {condition_type}")
             return
-        if os.path.exists(new_csv_file):
-            os.remove(new_csv_file)
-        for chunk in self.read_csv_in_chunks(csv_file, chunk_size=500):
-            with open(new_csv_file, 'a', newline='') as file:
-                columns = chunk[0].keys() if chunk else []  # Use the columns from the last chunk, if available
-                writer = csv.DictWriter(file, fieldnames=columns)
-                if file.tell() == 0:  # Check if it's a new file and write headers
-                    writer.writeheader()
+        get_value = operator.itemgetter(column_index)
+        with open(new_csv_file, 'w', newline='', buffering=1 << 20) as file:
+            writer = csv.writer(file)
+            writer.writerow(header)
 
-                for row in chunk:
-                    if filter_condition(row):
-                        writer.writerow(row)  # Write each row to the new file if the condition is not met
-        
-       
-        with open(new_csv_file, 'r') as output_csv:
-                output_reader = csv.DictReader(output_csv)
-                for row in output_reader:
-                    print(row)
+            for chunk in self.read_csv_in_chunks(csv_file, chunk_size=500):
+                # Write the rows that meet the condition to the new file
+                writer.writerows(itertools.compress(chunk, filter_condition(list(map(get_value, chunk)))))
+
+        self.print_table(new_csv_file)
         # os.remove(new_csv_file)
     
     def compare_values(self, value1, value2, reverse=False):
@@ -454,6 +702,33 @@ class NaiveDB:
             result = str(value1) < str(value2)
 
         return not result if reverse else result
+
+    def compare_column(self, values, value, reverse=False):
+        """
+        Compare every value of a column against a single value, following the same rules as
+        `compare_values`. The value and the column are each converted to int once, and the
+        comparison only falls back to `compare_values` for columns that hold non-integer values.
+
+        Parameters:
+        - values (list): The column values.
+        - value: The value to compare against.
+        - reverse (bool): If True, reverse the comparison result.
+
+        Returns:
+        - list: One bool per column value, True if the comparison holds.
+        """
+        try:
+            int_value = int(value)
+        except ValueError:
+            # A non-integer value is always compared as a string
+            return [v >= value for v in values] if reverse else [v < value for v in values]
+
+        try:
+            int_values = list(map(int, values))
+        except ValueError:
+            return [self.compare_values(v, value, reverse) for v in values]
+
+        return [v >= int_value for v in int_values] if reverse else [v < int_value for v in int_values]
    
     def updateTable(self, table_name, condition_col, condition_val, update_col, update_val, chunk_size=500):
         """
@@ -488,41 +763,44 @@ class NaiveDB:
                 print(f"ID '{update_val}' already exists in the CSV file. Update prevented.")
                 return
 
-        # Create a temporary output file for updates
-        temp_output_file = "temp_updated.csv"
-
         # Initialize variables for tracking the number of rows processed and updated
         rows_processed = 0
         rows_updated = 0
 
-        with open(csv_file, 'r') as file, open(temp_output_file, 'w', newline='') as temp_output_csv:
-            csv_reader = csv.DictReader(file)
-            fieldnames = csv_reader.fieldnames
-            csv_writer = csv.DictWriter(temp_output_csv, fieldnames=fieldnames)
-            csv_writer.writeheader()
-
-            current_chunk = []
-
-            for row in csv_reader:
-                # Check the condition and update the row if it matches
-                if row[condition_col] == condition_val:
-                    row[update_col] = update_val
-                    rows_updated += 1
-
-                current_chunk.append(row)
-
-                if len(current_chunk) >= chunk_size:
-                    csv_writer.writerows(current_chunk)
-                    current_chunk = []
-
-                rows_processed += 1
+        header = self.read_header(csv_file)
+        if condition_col not in header or update_col not in header:
+            print("One or more specified columns do not exist in the table.")
+            return
+        condition_index = header.index(condition_col)
+        update_index = header.index(update_col)
 
-            # Write any remaining rows in the last chunk
-            csv_writer.writerows(current_chunk)
+        get_condition = operator.itemgetter(condition_index)
 
-        # Rename the temp output file to the original CSV file to replace it
-        os.remove(csv_file)
-        os.rename(temp_output_file, csv_file)
+        # Write the updated rows to a temporary file next to the table
+        temp_output_file = self.create_temp_table(csv_file)
+        try:
+            with temp_output_file as temp_output_csv:
+                csv_writer = csv.writer(temp_output_csv)
+                csv_writer.writerow(header)
+
+                for chunk in self.read_csv_in_chunks(csv_file, chunk_size):
+                    # Check the condition against the condition column of the whole chunk, then update
+                    # only the rows that match
+                    matches = [value == condition_val for value in map(get_condition, chunk)]
+                    for row in itertools.compress(chunk, matches):
+                        row[update_index] = update_val
+                        rows_updated += 1
+
+                    csv_writer.writerows(chunk)
+                    rows_processed += len(chunk)
+        except BaseException:
+            os.remove(temp_output_file.name)
+            raise
+
+        # Atomically replace the original CSV file with the updated one
+        os.replace(temp_output_file.name, csv_file)
+        if update_col == id_column:
+            self._id_cache.pop(table_name, None)
 
         # Print a summary of the update operation
         print(f"Updated {rows_updated} out of {rows_processed} rows in '{table_name}.csv'.")
@@ -530,7 +808,11 @@ class NaiveDB:
     def join(self, first_table, table2_name, join_column_table1, join_column_table2, chunk_size=500):
         """
         The `join` function takes two CSV tables, joins them based on specified join columns, and prints
-        the combined rows.
+        the combined rows. It performs a block hash join: the smaller of the two tables is read one chunk
+        at a time into a hash index on its join column, and for each chunk the larger table is streamed
+        in chunks and probed against it. No more than one chunk of either table is held in memory, and
+        the combined rows come out chunk by chunk of the smaller table, each in the order of the larger
+        table.
         
         :param first_table: The name of the first table (CSV file) that you want to join with the second
         table
@@ -542,8 +824,8 @@ class NaiveDB:
         the second table (CSV file). It is used to match the values in this column with the values in
         the join_column_table1 column of the first table
         :param chunk_size: The `chunk_size` parameter determines the number of rows to process in each
-        chunk. It specifies how many rows from the first table will be read and processed at a time
-        before moving on to the next chunk. The default value is 500, but you can change it to any
+        chunk. It specifies how many rows of each table will be read and processed at a time before
+        moving on to the next chunk. The default value is 500, but you can change it to any
         integer value that suits, defaults to 500 (optional)
         :return: The function does not return anything.
         """
@@ -553,60 +835,43 @@ class NaiveDB:
         if os.path.exists('joined.csv'):
             os.remove('joined.csv')
 
-        # Read the data from the first CSV file and store it in chunks
-        with open(first_table, 'r') as table1_file:
-            csv_reader = csv.DictReader(table1_file)
-            current_chunk = []
-
-            for row in csv_reader:
-                current_chunk.append(row)
-
-                # If the current chunk size reaches the specified limit
-                if len(current_chunk) >= chunk_size:
-                    # Process the chunk
-                    self.process_chunk(current_chunk, table2_name, join_column_table2)
-                    current_chunk = []  # Clear the current chunk
+        header1 = self.read_header(first_table)
+        header2 = self.read_header(table2_name)
+        if join_column_table1 not in header1 or join_column_table2 not in header2:
+            print("One or more specified columns do not exist in the tables.")
+            return
+        join_index1 = header1.index(join_column_table1)
+        join_index2 = header2.index(join_column_table2)
 
-            # Process the last chunk (if not empty)
-            if current_chunk:
-                self.process_chunk(current_chunk, table2_name, join_column_table2)
+        # Hash the smaller table, so that the larger one is streamed as few times as possible
+        build_first = os.path.getsize(first_table) < os.path.getsize(table2_name)
+        if build_first:
+            build_table, build_index, probe_table, probe_index = first_table, join_index1, table2_name, join_index2
+        else:
+            build_table, build_index, probe_table, probe_index = table2_name, join_index2, first_table, join_index1
+
+        fieldnames = [f"table1_{col}" for col in header1] + [f"table2_{col}" for col in header2]
+        with open('joined.csv', 'w', newline='') as joined_csv:
+            csv_writer = csv.writer(joined_csv)
+            csv_writer.writerow(fieldnames)
+
+            for build_chunk in self.read_csv_in_chunks(build_table, chunk_size):
+                # Build phase: hash one chunk of the build table on the join column
+                hash_index = defaultdict(list)
+                for build_row in build_chunk:
+                    hash_index[build_row[build_index]].append(build_row)
+
+                # Probe phase: stream the other table in chunks and look up the matching rows
+                for chunk in self.read_csv_in_chunks(probe_table, chunk_size):
+                    combined_rows = []
+                    for probe_row in chunk:
+                        for build_row in hash_index.get(probe_row[probe_index], ()):
+                            # Create combined row with aliases for common columns, first table first
+                            combined_rows.append(build_row + probe_row if build_first else probe_row + build_row)
+                    csv_writer.writerows(combined_rows)
+                    self.print_rows(fieldnames, combined_rows)
         print(f"Combined rows saved to {'joined.csv'}.")
 
-    def process_chunk(self, chunk, table2_name, join_column_table2):
-        joined_csv_file = "joined.csv"
-
-        with open(table2_name, 'r') as table2_file:
-            csv_reader = csv.DictReader(table2_file)
-
-            row2_first = next(csv_reader)
-
-            with open(joined_csv_file, 'a', newline='') as joined_csv:
-                # Check if the file is empty and write the header if needed
-                if joined_csv.tell() == 0:
-                    fieldnames = [f"table1_{col}" for col in chunk[0].keys()] + [f"table2_{col}" for col in row2_first.keys()]
-                    csv_writer = csv.DictWriter(joined_csv, fieldnames=fieldnames)
-                    csv_writer.writeheader()
-
-                # Reset the reader to the beginning of table2
-                table2_file.seek(0)
-                next(csv_reader)  # Skip the header
-
-                for row2 in csv_reader:
-                    key = row2[join_column_table2]
-                    for row1 in chunk:
-                        if key == row1[join_column_table1]:
-                            # Create combined row with aliases for common columns
-                            combined_row = {}
-                            for col1, value1 in row1.items():
-                                combined_row[f"table1_{col1}"] = value1
-                            for col2, value2 in row2.items():
-                                combined_row[f"table2_{col2}"] = value2
-                            csv_writer.writerow(combined_row)
-
-                            print(combined_row)
-
-            
-
     def aggregate(self,csv_file, column_name, operation, chunk_size=500):
         """
         The `aggregate` function aggregates data from a specified column in a CSV file based on the
@@ -629,30 +894,40 @@ class NaiveDB:
             return
         try:
             operation = operation.lower()
-            if operation not in ('average', 'sum', 'minimum', 'maximum'):
+            if operation not in AGGREGATE_REDUCERS:
                 print("Invalid operation. Please choose from 'average', 'sum', 'minimum', or 'maximum'.")
                 return
 
             result = None
             row_count = 0
 
-            with open(csv_file, 'r') as file:
-                reader = csv.DictReader(file)
-
-                for row in reader:
-                    if column_name in row:
-                        value = int(row[column_name])
-
-                        if operation == 'average':
-                            result = result + value if result is not None else value
-                        elif operation == 'sum':
-                            result = result + value if result is not None else value
-                        elif operation == 'minimum':
-                            result = min(result, value) if result is not None else value
-                        elif operation == 'maximum':
-                            result = max(result, value) if result is not None else value
-
-                    row_count += 1                                                    
+            # Reuse the result of an earlier identical query as long as the table file is unchanged
+            signature = self.file_signature(csv_file)
+            cache_key = (csv_file, column_name, operation)
+            cached = self._aggregate_cache.get(cache_key)
+            if cached is not None and cached[0] == signature:
+                _, result, row_count = cached
+            else:
+                header = self.read_header(csv_file)
+                if column_name in header:
+                    column_index = header.index(column_name)
+                    workers = os.cpu_count() or 1
+
+                    if workers > 1 and os.path.getsize(csv_file) >= PARALLEL_SCAN_BYTES:
+                        # Reduce separate parts of the file in worker processes and combine the partial results
+                        byte_ranges = self.split_csv_ranges(csv_file, workers)
+                        with ProcessPoolExecutor(max_workers=workers) as executor:
+                            partials = list(executor.map(NaiveDB.aggregate_range, itertools.repeat(csv_file),
+                                                         itertools.repeat(column_index), itertools.repeat(operation),
+                                                         itertools.repeat(chunk_size), byte_ranges))
+                    else:
+                        partials = [NaiveDB.aggregate_range(csv_file, column_index, operation, chunk_size)]
+
+                    results = [partial for partial, _ in partials if partial is not None]
+                    row_count = sum(count for _, count in partials)
+                    if results:
+                        result = AGGREGATE_REDUCERS[operation](results)
+                    self._aggregate_cache[cache_key] = (signature, result, row_count)
 
             if result is not None:
                 if operation == 'average':
@@ -666,6 +941,128 @@ class NaiveDB:
         except ValueError:
             print(f"Error: Could not convert values in the '{column_name}' column to integers.")
   
+    @staticmethod
+    def aggregate_range(csv_file, column_index, operation, chunk_size=500, byte_range=None):
+        """
+        The `aggregate_range` function reduces one column of a CSV file, or of one byte range of it,
+        with the given aggregation operation. It is the unit of work of `aggregate`, and is a static
+        method so that it can be sent to worker processes.
+
+        :param csv_file: The path to the CSV file that contains the data to be aggregated
+        :param column_index: The position of the column to aggregate
+        :param operation: One of 'average', 'sum', 'minimum' or 'maximum'. Averages are reduced as sums
+        and divided by the row count by the caller
+        :param chunk_size: The number of rows to read and reduce at a time, defaults to 500 (optional)
+        :param byte_range: A `(start, end)` pair returned by `split_csv_ranges`, or None to reduce the
+        whole file, defaults to None (optional)
+        :return: a `(result, row_count)` tuple, where `result` is None when there were no rows.
+        """
+        result = AGGREGATE_IDENTITIES[operation]
+        row_count = 0
+        get_value = operator.itemgetter(column_index)
+        reducer = AGGREGATE_REDUCERS[operation]
+
+        for chunk in NaiveDB.read_csv_in_chunks(csv_file, chunk_size, byte_range):
+            # Project, convert and reduce the column of the whole chunk in a single pass, without
+            # building an intermediate list of values
+            result = reducer((result, reducer(map(int, map(get_value, chunk)))))
+            row_count += len(chunk)
+
+        if row_count == 0:
+            return None, 0
+        return result, row_count
+
+def handle_create_table(emulator, parts):
+    table_name = parts[1]
+    columns = parts[2].split(',')
+    emulator.create_table(table_name, columns)
+
+
+def handle_insert(emulator, parts):
+    table_name = parts[1]
+    values = parts[2].split(',')
+    emulator.insert(table_name, values)
+
+
+def handle_select(emulator, parts):
+    table_name = parts[1]
+    columns = parts[2].split(',') if parts[2] != 'all' else []
+    emulator.select(table_name, columns)
+
+
+def handle_order_by(emulator, parts):
+    table_name = parts[1]
+    column = parts[2]
+    emulator.order_by(table_name, column)
+
+
+def handle_update(emulator, parts):
+    table_name = parts[1]
+    condition_col = parts[2]
+    condition_val = parts[3]
+    update_col = parts[4]
+    update_val = parts[5]
+    emulator.updateTable(table_name, condition_col, condition_val, update_col, update_val)
+    print("Update complete.")
+
+
+def handle_delete(emulator, parts):
+    table_name = parts[1]
+    condition_col = parts[2]
+    condition_val = parts[3]
+    emulator.delete(table_name, condition_col, condition_val)
+    print("Delete complete.")
+
+
+def handle_group_by(emulator, parts):
+    table_name = parts[1]
+    column_name = parts[2]
+    emulator.group_by(table_name, column_name)
+
+
+def handle_filter(emulator, parts):
+    table_name = parts[1]
+    column_name = parts[2]
+    condition_value = parts[3]
+    condition_type = parts[4]
+    emulator.filter(table_name, column_name, condition_value, condition_type)
+
+
+def handle_join(emulator, parts):
+    first_table = parts[1]
+    table2_name = parts[2]
+    join_column_table1 = parts[3]
+    join_column_table2 = parts[4]
+    table1 = f"{first_table}.csv"
+    table2 = f"{table2_name}.csv"
+    emulator.join(table1, table2, join_column_table1, join_column_table2)
+
+
+def handle_aggregate(emulator, parts):
+    table_name = parts[1]
+    column_name = parts[2]
+    operation = parts[3]
+    emulator.aggregate(table_name, column_name, operation)
+
+
+def handle_invalid(emulator, parts):
+    print("Invalid command. Please try again.")
+
+
+# Maps each query command to the function that runs it
+COMMAND_HANDLERS = {
+    "newTable": handle_create_table,
+    "addToTable": handle_insert,
+    "showColumns": handle_select,
+    "sort": handle_order_by,
+    "set": handle_update,
+    "remove": handle_delete,
+    "formGroups": handle_group_by,
+    "filter": handle_filter,
+    "getCommon": handle_join,
+    "aggregate": handle_aggregate,
+}
+
 if __name__ == "__main__":
     emulator = NaiveDB()
 
@@ -686,78 +1083,9 @@ if __name__ == "__main__":
         query = input("NaiveDB > ")
 
         parts = query.split("|")
-        
 
         command = parts[0]
-        if command == "newTable":
-            table_name = parts[1]
-            columns = parts[2].split(',')
-            emulator.create_table(table_name, columns)
-            # print(f"Table '{table_name}' created with columns: {columns}")
-
-        elif command == "addToTable":
-            table_name = parts[1]
-            values = parts[2].split(',')
-            emulator.insert(table_name, values)
-
-        elif command == "showColumns":
-            table_name = parts[1]
-            columns = parts[2].split(',') if parts[2] != 'all' else []
-            emulator.select(table_name, columns)
-
-        elif command == "sort":
-            table_name = parts[1]
-            column = parts[2]
-            emulator.order_by(table_name, column)
-
-        elif command == "set":
-            table_name = parts[1]
-            condition_col = parts[2]
-            condition_val = parts[3]
-            update_col = parts[4]
-            update_val = parts[5]
-            emulator.updateTable(table_name, condition_col, condition_val, update_col, update_val)
-            print("Update complete.")
-
-        elif command == "remove":
-            table_name = parts[1]
-            condition_col = parts[2]
-            condition_val = parts[3]
-            delete_condition = lambda row: row.get(condition_col) == condition_val
-            emulator.delete(table_name, delete_condition)
-            print("Delete complete.")
-
-        elif command == "formGroups":
-            table_name = parts[1]
-            column_name = parts[2]
-            emulator.group_by(table_name, column_name)
-
-        elif command == "filter":
-            table_name = parts[1]
-            column_name = parts[2]
-            condition_value = parts[3]
-            condition_type = parts[4]
-            emulator.filter(table_name, column_name, condition_value, condition_type)
-
-        elif command == "getCommon":
-            first_table = parts[1]
-            table2_name = parts[2]
-            join_column_table1 = parts[3]
-            join_column_table2 = parts[4]
-            table1 = f"{first_table}.csv"
-            table2 = f"{table2_name}.csv"
-            emulator.join(table1, table2, join_column_table1, join_column_table2)
-
-        elif command == "aggregate":
-            table_name = parts[1]
-            column_name = parts[2]
-            operation = parts[3]
-            emulator.aggregate(table_name, column_name, operation)
-
-        elif command.lower() == "bye":
+        if command.lower() == "bye":
             break
-        
-
-        else:
-            print("Invalid command. Please try again.")
 
+        COMMAND_HANDLERS.get(command, handle_invalid)(emulator, parts)